@@ -19,44 +19,276 @@ Usage:
 """
 
 import argparse
+import base64
+import gzip
+import hashlib
 import json
 import os
+import pathlib
 import sys
+import threading
 import time
-from typing import Dict, List, Optional
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
 from urllib.parse import urljoin
 
-# Try to import requests, provide helpful error if not available
-try:
-    import requests
-    from requests.packages.urllib3.exceptions import InsecureRequestWarning
+# requests is imported lazily by _ensure_requests(), so that --help and argument
+# errors don't pay for (or require) the import
+requests = None
+HTTPAdapter = None
+Retry = None
+
+
+def _ensure_requests() -> None:
+    """Import requests on first use, providing a helpful error if not available."""
+    global requests, HTTPAdapter, Retry
+    if requests is not None:
+        return
+    
+    try:
+        import requests
+        from requests.adapters import HTTPAdapter
+        from requests.packages.urllib3.exceptions import InsecureRequestWarning
+        from requests.packages.urllib3.util.retry import Retry
+    except ImportError:
+        print("Error: 'requests' library is required. Install with: pip install requests")
+        sys.exit(1)
     requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
+
+# orjson is optional; it parses API responses considerably faster than stdlib json
+try:
+    import orjson
 except ImportError:
-    print("Error: 'requests' library is required. Install with: pip install requests")
-    sys.exit(1)
+    orjson = None
+
+# ijson is optional; it lets large stack listings be scanned without loading them whole
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+
+def _json_loads(data: bytes) -> Any:
+    """Decode a JSON document, using orjson when available."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _json_dumps(obj: Any) -> str:
+    """Encode an object as a JSON string, using orjson when available."""
+    if orjson is not None:
+        return orjson.dumps(obj).decode()
+    return json.dumps(obj)
+
+
+# Static per-service fields used by validation; desired is -1 for global services
+ServiceSpec = namedtuple('ServiceSpec', 'name desired is_global')
 
 
 class PortainerClient:
     """Client for interacting with Portainer API."""
     
-    def __init__(self, base_url: str, verify_ssl: bool = False):
+    # Swarm cluster IDs only change if the swarm is re-initialised
+    SWARM_ID_CACHE_TTL = 300.0
+    
+    # Minimum seconds between service checks in watch_validation
+    WATCH_MIN_CHECK_INTERVAL = 1.0
+    
+    # Request bodies smaller than this are never compressed
+    COMPRESS_MIN_SIZE = 4096
+    
+    # Go decode errors Portainer reports in a 400's 'details' when it parsed a
+    # gzip body as JSON (0x1f is the first gzip byte) or as multipart form data
+    GZIP_DECODE_ERRORS = ("invalid character '\\x1f'", "multipart: NextPart:")
+    
+    # Cached JWTs are only reused if they stay valid for at least this long
+    TOKEN_EXPIRY_MARGIN = 30
+    TOKEN_CACHE_DIR = pathlib.Path.home() / ".cache" / "portainer-automation"
+    
+    def __init__(
+        self,
+        base_url: str,
+        verify_ssl: bool = False,
+        endpoint_cache_ttl: float = 60.0,
+        token_cache: bool = True,
+        timeout: float = 30.0,
+        dns_ttl: float = 30.0,
+        compress_uploads: bool = False
+    ):
         """
         Initialize Portainer client.
         
         Args:
             base_url: Portainer server URL (e.g., https://portainer:9443)
             verify_ssl: Whether to verify SSL certificates
+            endpoint_cache_ttl: Seconds to cache the endpoint list (0 disables)
+            token_cache: Whether to reuse JWTs cached on disk between runs
+            timeout: Seconds to wait for connect/read on each API call (connect
+                only for stack create/update/delete)
+            dns_ttl: Seconds before pooled connections are recycled so the
+                Portainer hostname is re-resolved (0 disables)
+            compress_uploads: Whether to gzip large stack upload bodies
         """
+        _ensure_requests()
+        
         self.base_url = base_url.rstrip('/')
         self.verify_ssl = verify_ssl
         self.token: Optional[str] = None
+        self.token_cache = token_cache
+        self.timeout = timeout
+        # Creating, updating and removing stacks can legitimately outlast
+        # `timeout` (e.g. resolving registry images), so bound only the connect
+        self.deploy_timeout = (timeout, None)
+        self.dns_ttl = dns_ttl
+        self.compress_uploads = compress_uploads
+        self._pool_started = time.monotonic()
+        self._credentials: Optional[Tuple[str, str]] = None
+        self._token_from_cache = False
+        self._reauth_lock = threading.RLock()
+        self.endpoint_cache_ttl = endpoint_cache_ttl
+        self._cache: Dict[str, Tuple[float, Any]] = {}
         self.session = requests.Session()
         self.session.verify = verify_ssl
         
+        # Reuse TCP/TLS connections across calls and retry transient gateway errors.
+        # POST is left out of the retry set: creating a stack is not idempotent.
+        # Read errors are never retried: the request may already have been
+        # applied (a stack update is a full redeploy on the server).
+        adapter = HTTPAdapter(
+            pool_connections=16,
+            pool_maxsize=32,
+            max_retries=Retry(
+                total=5,
+                read=False,
+                backoff_factor=0.3,
+                status_forcelist=(502, 503, 504),
+                allowed_methods=frozenset(['GET', 'PUT', 'DELETE']),
+                # Hand the final response back so raise_for_status() raises HTTPError
+                raise_on_status=False
+            )
+        )
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers['Connection'] = 'keep-alive'
+        self.session.hooks['response'].append(self._expire_connections)
+        self.session.hooks['response'].append(self._reauthenticate_on_401)
+        
+    def _expire_connections(self, response: 'requests.Response', *args, **kwargs) -> 'requests.Response':
+        """
+        Response hook that drops idle pooled connections once dns_ttl has passed.
+        
+        Hostnames are resolved only when a new connection is opened, so a
+        long-lived keep-alive connection would otherwise stick to a stale
+        address, e.g. a Swarm VIP that moved during a rolling update.
+        Connections still in use are unaffected and close when released.
+        """
+        if self.dns_ttl > 0 and time.monotonic() - self._pool_started >= self.dns_ttl:
+            for adapter in self.session.adapters.values():
+                adapter.poolmanager.clear()
+            self._pool_started = time.monotonic()
+        return response
+    
+    def _reauthenticate_on_401(self, response: 'requests.Response', *args, **kwargs) -> 'requests.Response':
+        """
+        Response hook that recovers from a rejected cached JWT.
+        
+        Portainer signs tokens with a secret generated at startup, so a cached
+        token can be refused long before it expires. On the first 401 the cache
+        file is removed, a fresh token is obtained and the request is resent
+        once; a 401 with a freshly issued token is returned unchanged.
+        """
+        if response.status_code != 401 or self._credentials is None:
+            return response
+        
+        with self._reauth_lock:
+            # Another thread may already have replaced the token
+            if response.request.headers.get('Authorization') == f'Bearer {self.token}':
+                if not self._token_from_cache:
+                    return response
+                self._token_from_cache = False
+                username, password = self._credentials
+                print("⚠ Cached token was rejected, re-authenticating")
+                try:
+                    self._token_cache_path(username).unlink()
+                except OSError:
+                    pass
+                if not self._login(username, password):
+                    return response
+        
+        response.close()
+        request = response.request.copy()
+        request.headers['Authorization'] = f'Bearer {self.token}'
+        return self.session.send(request, **kwargs)
+    
+    @staticmethod
+    def _json(response: 'requests.Response') -> Any:
+        """Parse a response body as JSON."""
+        return _json_loads(response.content)
+    
+    def _cached(self, key: str, ttl: float, fn: Callable[[], Any]) -> Any:
+        """
+        Return a cached value for key, calling fn to refresh it after ttl seconds.
+        
+        Only use for data that is static for the lifetime of a CLI run
+        (endpoints, swarm IDs) - never for stack or service state.
+        """
+        entry = self._cache.get(key)
+        if entry is not None and time.monotonic() - entry[0] < ttl:
+            return entry[1]
+        
+        value = fn()
+        self._cache[key] = (time.monotonic(), value)
+        return value
+    
+    @staticmethod
+    def _jwt_expiry(token: str) -> Optional[float]:
+        """Read the 'exp' claim from a JWT without verifying its signature."""
+        try:
+            claims = token.split('.')[1]
+            claims += '=' * (-len(claims) % 4)
+            return float(_json_loads(base64.urlsafe_b64decode(claims))['exp'])
+        except (IndexError, KeyError, TypeError, ValueError):
+            return None
+    
+    def _token_cache_path(self, username: str) -> pathlib.Path:
+        """Path of the cached JWT for this server and user."""
+        key = hashlib.sha256(f"{self.base_url}\0{username}".encode()).hexdigest()
+        return self.TOKEN_CACHE_DIR / f"{key}.json"
+    
+    def _load_cached_token(self, username: str) -> Optional[str]:
+        """Return a cached JWT that is still valid, or None."""
+        try:
+            cached = _json_loads(self._token_cache_path(username).read_bytes())
+        except (OSError, ValueError):
+            return None
+        
+        token = cached.get('jwt') if isinstance(cached, dict) else None
+        exp = self._jwt_expiry(token) if token else None
+        if exp is None or exp <= time.time() + self.TOKEN_EXPIRY_MARGIN:
+            return None
+        return token
+    
+    def _store_cached_token(self, username: str, token: str) -> None:
+        """Write a JWT to the on-disk cache, readable by the current user only."""
+        path = self._token_cache_path(username)
+        try:
+            path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w') as f:
+                f.write(_json_dumps({"jwt": token, "exp": self._jwt_expiry(token)}))
+        except OSError:
+            # The cache is an optimisation only
+            pass
+    
     def authenticate(self, username: str, password: str) -> bool:
         """
         Authenticate with Portainer and store JWT token.
         
+        Reuses a still-valid JWT from the on-disk cache when token caching is
+        enabled, skipping the /api/auth round-trip.
+        
         Args:
             username: Portainer username
             password: Portainer password
@@ -64,31 +296,82 @@ class PortainerClient:
         Returns:
             True if authentication successful
         """
+        if self.token_cache:
+            cached_token = self._load_cached_token(username)
+            if cached_token:
+                self.token = cached_token
+                self.session.headers.update({'Authorization': f'Bearer {self.token}'})
+                # Kept so _reauthenticate_on_401 can log in again if the server
+                # no longer accepts the cached token (restart, upgrade, logout)
+                self._credentials = (username, password)
+                self._token_from_cache = True
+                print(f"✓ Reusing cached token for '{username}'")
+                return True
+        
+        return self._login(username, password)
+    
+    def _login(self, username: str, password: str) -> bool:
+        """Obtain a new JWT from /api/auth and cache it on disk if enabled."""
         url = f"{self.base_url}/api/auth"
         payload = {"username": username, "password": password}
         
         try:
-            response = self.session.post(url, json=payload)
+            response = self.session.post(url, json=payload, timeout=self.timeout)
             response.raise_for_status()
-            self.token = response.json().get('jwt')
+            self.token = self._json(response).get('jwt')
             self.session.headers.update({'Authorization': f'Bearer {self.token}'})
+            if self.token_cache and self.token:
+                self._store_cached_token(username, self.token)
             print(f"✓ Successfully authenticated as '{username}'")
             return True
-        except requests.exceptions.RequestException as e:
+        except (requests.exceptions.RequestException, ValueError) as e:
             print(f"✗ Authentication failed: {e}")
             return False
     
-    def get_endpoints(self) -> List[Dict]:
+    def get_endpoints(self, search: Optional[str] = None) -> List[Dict]:
         """
         Get list of Portainer endpoints (environments).
         
+        Every endpoint returned also seeds the get_endpoint() cache.
+        
+        Args:
+            search: Optional server-side search term (substring match)
+            
         Returns:
             List of endpoint dictionaries
         """
-        url = f"{self.base_url}/api/endpoints"
-        response = self.session.get(url)
-        response.raise_for_status()
-        return response.json()
+        def fetch() -> List[Dict]:
+            url = f"{self.base_url}/api/endpoints"
+            params = {"search": search} if search else {}
+            response = self.session.get(url, params=params, timeout=self.timeout)
+            response.raise_for_status()
+            endpoints = self._json(response)
+            
+            now = time.monotonic()
+            for ep in endpoints:
+                self._cache[f"endpoint:{ep['Id']}"] = (now, ep)
+            return endpoints
+        
+        key = f"endpoints:{search}" if search else "endpoints"
+        return self._cached(key, self.endpoint_cache_ttl, fetch)
+    
+    def get_endpoint(self, endpoint_id: int) -> Dict:
+        """
+        Get details of a specific endpoint, including its latest snapshot.
+        
+        Args:
+            endpoint_id: Portainer endpoint ID
+            
+        Returns:
+            Endpoint dictionary
+        """
+        def fetch() -> Dict:
+            url = f"{self.base_url}/api/endpoints/{endpoint_id}"
+            response = self.session.get(url, timeout=self.timeout)
+            response.raise_for_status()
+            return self._json(response)
+        
+        return self._cached(f"endpoint:{endpoint_id}", self.endpoint_cache_ttl, fetch)
     
     def get_endpoint_id(self, endpoint_name: Optional[str] = None) -> int:
         """
@@ -100,14 +383,15 @@ class PortainerClient:
         Returns:
             Endpoint ID
         """
-        endpoints = self.get_endpoints()
-        
         if endpoint_name:
-            for ep in endpoints:
+            # Search server-side, but still require an exact name match
+            for ep in self.get_endpoints(search=endpoint_name):
                 if ep['Name'] == endpoint_name:
                     return ep['Id']
             raise ValueError(f"Endpoint '{endpoint_name}' not found")
         
+        endpoints = self.get_endpoints()
+        
         # Return first Swarm endpoint (Type 2 = Swarm, Type 1 = Docker)
         for ep in endpoints:
             if ep.get('Type') in [1, 2]:  # Docker or Swarm
@@ -115,6 +399,24 @@ class PortainerClient:
         
         raise ValueError("No valid endpoint found")
     
+    def get_endpoint_ids(self, endpoint_names: List[str]) -> List[int]:
+        """
+        Resolve several endpoint names to IDs from a single endpoint listing.
+        
+        Args:
+            endpoint_names: Names of endpoints to find
+            
+        Returns:
+            Endpoint IDs, in the same order as endpoint_names
+        """
+        ids_by_name = {ep['Name']: ep['Id'] for ep in self.get_endpoints()}
+        
+        missing = [name for name in endpoint_names if name not in ids_by_name]
+        if missing:
+            raise ValueError(f"Endpoint(s) not found: {', '.join(missing)}")
+        
+        return [ids_by_name[name] for name in endpoint_names]
+    
     def get_swarm_id(self, endpoint_id: int) -> str:
         """
         Get Swarm cluster ID for an endpoint.
@@ -125,22 +427,97 @@ class PortainerClient:
         Returns:
             Swarm cluster ID
         """
-        url = f"{self.base_url}/api/endpoints/{endpoint_id}/docker/swarm"
-        response = self.session.get(url)
-        response.raise_for_status()
-        return response.json().get('ID', '')
+        def fetch() -> str:
+            url = f"{self.base_url}/api/endpoints/{endpoint_id}/docker/swarm"
+            response = self.session.get(url, timeout=self.timeout)
+            response.raise_for_status()
+            return self._json(response).get('ID', '')
+        
+        return self._cached(f"swarm:{endpoint_id}", self.SWARM_ID_CACHE_TTL, fetch)
     
-    def list_stacks(self) -> List[Dict]:
+    def get_endpoint_swarm_id(self, endpoint_id: int) -> str:
         """
-        List all stacks across all endpoints.
+        Get Swarm cluster ID for an endpoint, preferring its cached snapshot.
+        
+        The endpoint is usually already cached from resolving its name, so
+        this normally costs no request; the Docker swarm API is only queried
+        when the snapshot has no swarm information.
         
+        Args:
+            endpoint_id: Portainer endpoint ID
+            
         Returns:
-            List of stack dictionaries
+            Swarm cluster ID
+        """
+        snapshots = self.get_endpoint(endpoint_id).get('Snapshots') or [{}]
+        raw = snapshots[0].get('DockerSnapshotRaw') or {}
+        swarm_id = (((raw.get('Info') or {}).get('Swarm') or {}).get('Cluster') or {}).get('ID')
+        return swarm_id or self.get_swarm_id(endpoint_id)
+    
+    def iter_stacks(self, endpoint_ids: Optional[List[int]] = None) -> Iterator[Dict]:
+        """
+        Iterate over stacks, optionally restricted to a set of endpoints.
+        
+        Always a single request: one endpoint is filtered server-side, while
+        several are fetched in one unfiltered listing and filtered locally
+        (Portainer's EndpointID filter only takes a single ID). When ijson is
+        installed the response is parsed incrementally, so callers that stop
+        early never parse the remainder.
+        
+        Args:
+            endpoint_ids: Optional endpoint IDs to restrict the listing to
+            
+        Yields:
+            Stack dictionaries
         """
         url = f"{self.base_url}/api/stacks"
-        response = self.session.get(url)
-        response.raise_for_status()
-        return response.json()
+        params = {}
+        if endpoint_ids is not None and len(endpoint_ids) == 1:
+            params["filters"] = _json_dumps({"EndpointID": endpoint_ids[0]})
+        wanted = set(endpoint_ids) if endpoint_ids is not None else None
+        
+        response = self.session.get(url, params=params, stream=ijson is not None, timeout=self.timeout)
+        try:
+            response.raise_for_status()
+            if ijson is not None:
+                response.raw.decode_content = True
+                stacks = ijson.items(response.raw, 'item', use_float=True)
+            else:
+                stacks = self._json(response)
+            
+            for stack in stacks:
+                if wanted is None or stack.get('EndpointId') in wanted:
+                    yield stack
+        finally:
+            response.close()
+    
+    def list_stacks(self, endpoint_ids: Optional[List[int]] = None) -> List[Dict]:
+        """
+        List stacks, optionally restricted to a set of endpoints.
+        
+        Args:
+            endpoint_ids: Optional endpoint IDs to restrict the listing to
+            
+        Returns:
+            List of stack dictionaries
+        """
+        return list(self.iter_stacks(endpoint_ids))
+    
+    def find_stack(self, name: str, endpoint_id: int) -> Optional[Dict]:
+        """
+        Find a stack by name on a specific endpoint.
+        
+        Filtering by endpoint happens server-side, so only that endpoint's
+        stacks are transferred; the name is matched locally.
+        
+        Args:
+            name: Stack name
+            endpoint_id: Portainer endpoint ID
+            
+        Returns:
+            Stack dictionary, or None if no such stack exists
+        """
+        return next((s for s in self.iter_stacks([endpoint_id]) if s['Name'] == name), None)
     
     def get_stack(self, stack_id: int) -> Dict:
         """
@@ -153,20 +530,81 @@ class PortainerClient:
             Stack details dictionary
         """
         url = f"{self.base_url}/api/stacks/{stack_id}"
-        response = self.session.get(url)
+        response = self.session.get(url, timeout=self.timeout)
         response.raise_for_status()
-        return response.json()
+        return self._json(response)
+    
+    @classmethod
+    def _gzip_rejected(cls, response: 'requests.Response') -> bool:
+        """
+        Whether an error response means the compressed body could not be decoded.
+        
+        Only a 415, or a 400 whose details start with a known decode error,
+        qualifies: anything else may mean the request was understood and
+        rejected, and resending it (especially a stack-create POST) is unsafe.
+        """
+        if response.status_code == 415:
+            return True
+        if response.status_code != 400:
+            return False
+        try:
+            details = _json_loads(response.content).get('details') or ''
+        except (ValueError, AttributeError):
+            return False
+        return isinstance(details, str) and details.startswith(cls.GZIP_DECODE_ERRORS)
+    
+    def _send_body(
+        self,
+        method: str,
+        url: str,
+        params: Dict,
+        body: bytes,
+        content_type: str
+    ) -> 'requests.Response':
+        """
+        Send a request body, gzip-compressing it when enabled and large enough.
+        
+        If the server could not decode the compressed body (see
+        _gzip_rejected), the request is resent uncompressed and compression
+        is disabled for this client; any other error response is returned
+        unchanged.
+        """
+        headers = {'Content-Type': content_type}
+        
+        if self.compress_uploads and len(body) > self.COMPRESS_MIN_SIZE:
+            response = self.session.request(
+                method, url,
+                params=params,
+                data=gzip.compress(body),
+                headers={**headers, 'Content-Encoding': 'gzip'},
+                timeout=self.deploy_timeout
+            )
+            if not self._gzip_rejected(response):
+                return response
+            print("⚠ Server rejected gzip-compressed body, retrying uncompressed")
+            self.compress_uploads = False
+        
+        return self.session.request(
+            method, url,
+            params=params,
+            data=body,
+            headers=headers,
+            timeout=self.deploy_timeout
+        )
     
     def deploy_stack(
         self,
         name: str,
-        compose_content: str,
+        compose_content: Union[str, bytes],
         endpoint_id: int,
         env_vars: Optional[List[Dict]] = None
     ) -> Dict:
         """
         Deploy a new stack from compose file content.
         
+        The compose file is uploaded as a multipart file part, so its raw
+        bytes are sent as-is rather than escaped into a JSON string.
+        
         Args:
             name: Stack name
             compose_content: Docker Compose file content
@@ -176,21 +614,24 @@ class PortainerClient:
         Returns:
             Deployed stack details
         """
-        swarm_id = self.get_swarm_id(endpoint_id)
+        swarm_id = self.get_endpoint_swarm_id(endpoint_id)
         
-        url = f"{self.base_url}/api/stacks/create/swarm/string"
+        url = f"{self.base_url}/api/stacks/create/swarm/file"
         params = {"endpointId": endpoint_id}
         
-        payload = {
-            "name": name,
-            "stackFileContent": compose_content,
-            "swarmID": swarm_id,
-            "env": env_vars or []
-        }
+        if isinstance(compose_content, str):
+            compose_content = compose_content.encode('utf-8')
         
-        response = self.session.post(url, params=params, json=payload)
+        body, content_type = requests.packages.urllib3.encode_multipart_formdata({
+            "Name": name,
+            "SwarmID": swarm_id,
+            "Env": _json_dumps(env_vars or []),
+            "file": ("docker-compose.yml", compose_content, "application/yaml")
+        })
+        
+        response = self._send_body('POST', url, params, body, content_type)
         response.raise_for_status()
-        return response.json()
+        return self._json(response)
     
     def update_stack(
         self,
@@ -222,9 +663,10 @@ class PortainerClient:
             "prune": prune
         }
         
-        response = self.session.put(url, params=params, json=payload)
+        body = _json_dumps(payload).encode('utf-8')
+        response = self._send_body('PUT', url, params, body, 'application/json')
         response.raise_for_status()
-        return response.json()
+        return self._json(response)
     
     def delete_stack(self, stack_id: int, endpoint_id: int) -> bool:
         """
@@ -240,7 +682,7 @@ class PortainerClient:
         url = f"{self.base_url}/api/stacks/{stack_id}"
         params = {"endpointId": endpoint_id}
         
-        response = self.session.delete(url, params=params)
+        response = self.session.delete(url, params=params, timeout=self.deploy_timeout)
         response.raise_for_status()
         return True
     
@@ -256,74 +698,363 @@ class PortainerClient:
             List of service dictionaries
         """
         url = f"{self.base_url}/api/endpoints/{endpoint_id}/docker/services"
-        params = {"filters": json.dumps({"label": [f"com.docker.stack.namespace={stack_name}"]})}
+        params = {"filters": _json_dumps({"label": [f"com.docker.stack.namespace={stack_name}"]})}
         
-        response = self.session.get(url, params=params)
+        response = self.session.get(url, params=params, timeout=self.timeout)
         response.raise_for_status()
-        return response.json()
+        return self._json(response)
+    
+    @staticmethod
+    def _service_spec(specs: Dict[Tuple[str, Any], ServiceSpec], svc: Dict) -> ServiceSpec:
+        """
+        Return the static spec fields of a service, extracting them only once.
+        
+        Keyed by service ID and spec version, so a service that is updated
+        mid-validation (e.g. rescaled) gets a fresh snapshot.
+        """
+        key = (svc['ID'], svc['Version']['Index'])
+        spec = specs.get(key)
+        if spec is None:
+            mode = svc['Spec'].get('Mode', {})
+            is_global = 'Replicated' not in mode
+            desired = -1 if is_global else mode['Replicated'].get('Replicas', 0)
+            spec = specs[key] = ServiceSpec(svc['Spec']['Name'], desired, is_global)
+        return spec
     
-    def validate_deployment(self, endpoint_id: int, stack_name: str, timeout: int = 120) -> bool:
+    @classmethod
+    def _report_services(
+        cls,
+        services: List[Dict],
+        specs: Dict[Tuple[str, Any], ServiceSpec],
+        verbose: bool
+    ) -> Tuple[bool, int]:
+        """
+        Evaluate and print the health of a stack's services.
+        
+        Args:
+            services: Services as returned by get_stack_services
+            specs: Spec snapshot cache, reused across calls
+            verbose: Print the per-service table even when not yet healthy
+            
+        Returns:
+            Tuple of (all services healthy, total running tasks)
+        """
+        polled = [
+            (cls._service_spec(specs, svc), svc.get('ServiceStatus', {}).get('RunningTasks', 0))
+            for svc in services
+        ]
+        total_running = sum(running for _, running in polled)
+        
+        # Replicated services are all healthy exactly when the capped sums match
+        desired_total = sum(spec.desired for spec, _ in polled if not spec.is_global)
+        ready_total = sum(min(running, spec.desired) for spec, running in polled if not spec.is_global)
+        # Global services count as up once they have at least one running task
+        global_total = sum(1 for spec, _ in polled if spec.is_global)
+        global_up = sum(1 for spec, running in polled if spec.is_global and running > 0)
+        all_healthy = ready_total == desired_total and global_up == global_total
+        
+        if all_healthy or verbose:
+            # Build the whole table and emit it with a single write
+            rows = ["", f"{'Service':<30} {'Replicas':<15} {'Status':<10}", "-" * 55]
+            for spec, running in polled:
+                if not spec.is_global:
+                    status = "✓ OK" if running >= spec.desired else "⏳ Starting"
+                    rows.append(f"{spec.name:<30} {running}/{spec.desired:<12} {status:<10}")
+                else:
+                    rows.append(f"{spec.name:<30} {'global':<12} {'✓ OK' if running > 0 else '⏳':<10}")
+            rows.append("")
+            sys.stdout.write("\n".join(rows))
+            sys.stdout.flush()
+        else:
+            progress = []
+            if desired_total or not global_total:
+                progress.append(f"{ready_total}/{desired_total} tasks ready")
+            if global_total:
+                progress.append(f"{global_up}/{global_total} global services running")
+            print(f"⏳ {', '.join(progress)}")
+        
+        return all_healthy, total_running
+    
+    def validate_deployment(
+        self,
+        endpoint_id: int,
+        stack_name: str,
+        timeout: int = 120,
+        max_interval: float = 15.0,
+        verbose: bool = False
+    ) -> bool:
         """
         Validate that all services in a stack are running correctly.
         
+        Polls with exponential backoff (1s, 2s, 4s, ... up to max_interval),
+        resetting to 1s whenever the number of running tasks increases.
+        
         Args:
             endpoint_id: Portainer endpoint ID
             stack_name: Name of the stack
             timeout: Maximum time to wait for services (seconds)
+            max_interval: Upper bound on the delay between polls (seconds)
+            verbose: Print the per-service table on every poll, not just at the end
             
         Returns:
             True if all services are healthy
         """
         print(f"\n📋 Validating deployment of stack '{stack_name}'...")
         
-        start_time = time.time()
+        # Monotonic deadline: immune to wall-clock (NTP) adjustments
+        deadline = time.monotonic_ns() + int(timeout * 1_000_000_000)
+        interval = 1.0
+        last_running = -1
+        specs: Dict[Tuple[str, Any], ServiceSpec] = {}
         
-        while time.time() - start_time < timeout:
+        while time.monotonic_ns() < deadline:
             services = self.get_stack_services(endpoint_id, stack_name)
             
             if not services:
                 print("⏳ Waiting for services to appear...")
-                time.sleep(5)
+                time.sleep(interval)
+                interval = min(interval * 2, max_interval)
                 continue
             
-            all_healthy = True
-            print(f"\n{'Service':<30} {'Replicas':<15} {'Status':<10}")
-            print("-" * 55)
-            
-            for svc in services:
-                name = svc['Spec']['Name']
-                mode = svc['Spec'].get('Mode', {})
-                
-                if 'Replicated' in mode:
-                    desired = mode['Replicated'].get('Replicas', 0)
-                    running = svc.get('ServiceStatus', {}).get('RunningTasks', 0)
-                    status = "✓ OK" if running >= desired else "⏳ Starting"
-                    
-                    if running < desired:
-                        all_healthy = False
-                    
-                    print(f"{name:<30} {running}/{desired:<12} {status:<10}")
-                else:
-                    # Global mode
-                    running = svc.get('ServiceStatus', {}).get('RunningTasks', 0)
-                    print(f"{name:<30} {'global':<12} {'✓ OK' if running > 0 else '⏳':<10}")
-                    
-                    if running == 0:
-                        all_healthy = False
-            
+            all_healthy, total_running = self._report_services(services, specs, verbose)
             if all_healthy:
                 print(f"\n✓ All services are running!")
                 return True
             
-            time.sleep(5)
+            # Poll quickly while tasks are coming up, back off once progress stalls
+            if total_running > last_running:
+                interval = 1.0
+            else:
+                interval = min(interval * 2, max_interval)
+            last_running = total_running
+            
+            time.sleep(interval)
         
         print(f"\n✗ Timeout waiting for services to become healthy")
         return False
+    
+    def _open_event_stream(
+        self,
+        endpoint_id: int,
+        filters: Dict,
+        idle_timeout: float,
+        since: Optional[int] = None
+    ) -> 'requests.Response':
+        """
+        Open a Docker event stream on an endpoint.
+        
+        Args:
+            endpoint_id: Portainer endpoint ID
+            filters: Docker event filters
+            idle_timeout: Read timeout; the stream is reopened after this long without events
+            since: Optional server timestamp (ns) to resume from, inclusive
+            
+        Returns:
+            Streaming response, one JSON event per line
+        """
+        url = f"{self.base_url}/api/endpoints/{endpoint_id}/docker/events"
+        
+        # Idle read timeouts are expected here; a retrying adapter would burn
+        # the validation budget re-opening the stream before reporting them
+        if url not in self.session.adapters:
+            self.session.mount(url, HTTPAdapter(max_retries=0))
+        
+        params = {"filters": _json_dumps(filters)}
+        if since is not None:
+            params["since"] = f"{since // 1_000_000_000}.{since % 1_000_000_000:09d}"
+        
+        response = self.session.get(url, params=params, stream=True, timeout=(self.timeout, idle_timeout))
+        response.raise_for_status()
+        return response
+    
+    def _pump_events(
+        self,
+        response: 'requests.Response',
+        endpoint_id: int,
+        filters: Dict,
+        idle_timeout: float,
+        wakeup: threading.Event,
+        stop: threading.Event
+    ) -> None:
+        """
+        Thread target: set wakeup for every event until stop is set.
+        
+        Idle streams time out and are reopened from just after the last
+        event seen, using the server's own timeNano so no local clock is
+        involved. If the stream cannot be reopened the thread exits and the
+        watcher degrades to its periodic re-check.
+        """
+        last_event: Optional[int] = None
+        while not stop.is_set():
+            try:
+                for line in response.iter_lines():
+                    if stop.is_set():
+                        break
+                    if line:
+                        last_event = _json_loads(line).get('timeNano', last_event)
+                        wakeup.set()
+            except (requests.exceptions.RequestException, ValueError):
+                pass
+            finally:
+                response.close()
+            
+            # Pause before reopening so a stream that keeps closing can't spin
+            if stop.wait(self.WATCH_MIN_CHECK_INTERVAL):
+                return
+            try:
+                response = self._open_event_stream(
+                    endpoint_id,
+                    filters,
+                    idle_timeout,
+                    since=last_event + 1 if last_event is not None else None
+                )
+            except requests.exceptions.RequestException:
+                return
+    
+    def _start_event_pump(
+        self,
+        endpoint_id: int,
+        filters: Dict,
+        idle_timeout: float,
+        wakeup: threading.Event
+    ) -> threading.Event:
+        """Open an event stream and follow it on a daemon thread; returns its stop flag."""
+        response = self._open_event_stream(endpoint_id, filters, idle_timeout)
+        stop = threading.Event()
+        threading.Thread(
+            target=self._pump_events,
+            args=(response, endpoint_id, filters, idle_timeout, wakeup, stop),
+            daemon=True
+        ).start()
+        return stop
+    
+    def watch_validation(
+        self,
+        endpoint_id: int,
+        stack_name: str,
+        timeout: int = 120,
+        max_interval: float = 15.0,
+        verbose: bool = False
+    ) -> bool:
+        """
+        Validate a stack by reacting to Docker events instead of polling.
+        
+        Follows two event streams: container events labelled with the stack
+        namespace, and service events for the stack's service IDs (service
+        events carry no labels). Service state is re-checked when an event
+        arrives, at most once per WATCH_MIN_CHECK_INTERVAL, and at least
+        every max_interval since ServiceStatus can lag behind the events.
+        
+        Container events are local to the node Portainer talks to, so on a
+        multi-node swarm task changes elsewhere are only seen through service
+        events or the periodic re-check. Falls back to validate_deployment
+        if the event stream cannot be opened.
+        
+        Args:
+            endpoint_id: Portainer endpoint ID
+            stack_name: Name of the stack
+            timeout: Maximum time to wait for services (seconds)
+            max_interval: Longest wait for an event before re-checking (seconds)
+            verbose: Print the per-service table on every check, not just at the end
+            
+        Returns:
+            True if all services are healthy
+        """
+        print(f"\n📋 Watching deployment of stack '{stack_name}'...")
+        
+        deadline = time.monotonic_ns() + int(timeout * 1_000_000_000)
+        wakeup = threading.Event()
+        specs: Dict[Tuple[str, Any], ServiceSpec] = {}
+        
+        try:
+            container_pump = self._start_event_pump(
+                endpoint_id,
+                {"type": ["container"], "label": [f"com.docker.stack.namespace={stack_name}"]},
+                max_interval,
+                wakeup
+            )
+        except requests.exceptions.RequestException as e:
+            print(f"⚠ Docker event stream unavailable ({e}), falling back to polling")
+            return self.validate_deployment(
+                endpoint_id,
+                stack_name,
+                timeout=max(0, deadline - time.monotonic_ns()) / 1_000_000_000,
+                max_interval=max_interval,
+                verbose=verbose
+            )
+        
+        service_pump: Optional[threading.Event] = None
+        service_ids: frozenset = frozenset()
+        
+        try:
+            while time.monotonic_ns() < deadline:
+                # Clear before checking, so events during the check trigger another one
+                wakeup.clear()
+                last_check = time.monotonic()
+                services = self.get_stack_services(endpoint_id, stack_name)
+                
+                if not services:
+                    print("⏳ Waiting for services to appear...")
+                else:
+                    ids = frozenset(svc['ID'] for svc in services)
+                    if ids != service_ids:
+                        if service_pump is not None:
+                            service_pump.set()
+                            service_pump = None
+                        service_ids = ids
+                        try:
+                            service_pump = self._start_event_pump(
+                                endpoint_id,
+                                {"type": ["service"], "service": sorted(ids)},
+                                max_interval,
+                                wakeup
+                            )
+                        except requests.exceptions.RequestException:
+                            pass
+                    
+                    if self._report_services(services, specs, verbose)[0]:
+                        print(f"\n✓ All services are running!")
+                        return True
+                
+                # Wait locally for an event, bounded by max_interval and the deadline
+                remaining = (deadline - time.monotonic_ns()) / 1_000_000_000
+                wakeup.wait(timeout=max(0.0, min(max_interval, remaining)))
+                
+                # Coalesce bursts of events (e.g. a crash-looping container)
+                gap = self.WATCH_MIN_CHECK_INTERVAL - (time.monotonic() - last_check)
+                remaining = (deadline - time.monotonic_ns()) / 1_000_000_000
+                if gap > 0 and remaining > 0:
+                    time.sleep(min(gap, remaining))
+        finally:
+            container_pump.set()
+            if service_pump is not None:
+                service_pump.set()
+        
+        print(f"\n✗ Timeout waiting for services to become healthy")
+        return False
+
+
+def resolve_endpoint_ids(client: PortainerClient, endpoint_arg: Optional[str]) -> List[int]:
+    """Resolve an --endpoint value, which may be a comma-separated list, to endpoint IDs."""
+    names = [n.strip() for n in endpoint_arg.split(',') if n.strip()] if endpoint_arg else []
+    # Drop repeats (keeping order) so a stack is never deployed twice to one endpoint
+    endpoint_names = list(dict.fromkeys(names))
+    if len(endpoint_names) > 1:
+        return client.get_endpoint_ids(endpoint_names)
+    return [client.get_endpoint_id(endpoint_names[0] if endpoint_names else None)]
 
 
 def cmd_list(client: PortainerClient, args: argparse.Namespace) -> int:
-    """List all stacks."""
-    stacks = client.list_stacks()
+    """List all stacks, or only those on the --endpoint endpoint(s)."""
+    endpoint_ids = None
+    if args.endpoint:
+        try:
+            endpoint_ids = resolve_endpoint_ids(client, args.endpoint)
+        except ValueError as e:
+            print(f"✗ {e}")
+            return 1
+    
+    stacks = client.list_stacks(endpoint_ids)
     
     if not stacks:
         print("No stacks found.")
@@ -348,8 +1079,15 @@ def cmd_deploy(client: PortainerClient, args: argparse.Namespace) -> int:
         print(f"✗ Compose file not found: {args.compose_file}")
         return 1
     
-    with open(args.compose_file, 'r') as f:
-        compose_content = f.read()
+    # Read raw bytes and decode once; avoids text-mode newline translation
+    # and locale-dependent decoding
+    with open(args.compose_file, 'rb') as f:
+        compose_bytes = f.read()
+    try:
+        compose_content = compose_bytes.decode('utf-8')
+    except UnicodeDecodeError as e:
+        print(f"✗ Compose file is not valid UTF-8: {e}")
+        return 1
     
     # Parse environment variables
     env_vars = []
@@ -359,49 +1097,65 @@ def cmd_deploy(client: PortainerClient, args: argparse.Namespace) -> int:
                 key, value = env.split('=', 1)
                 env_vars.append({"name": key, "value": value})
     
-    # Get endpoint ID
+    # Resolve endpoint IDs (--endpoint may be a comma-separated list)
     try:
-        endpoint_id = client.get_endpoint_id(args.endpoint)
-        print(f"✓ Using endpoint ID: {endpoint_id}")
+        endpoint_ids = resolve_endpoint_ids(client, args.endpoint)
+        print(f"✓ Using endpoint ID(s): {', '.join(str(eid) for eid in endpoint_ids)}")
     except ValueError as e:
         print(f"✗ {e}")
         return 1
     
-    # Check if stack exists
-    existing_stack = None
-    for stack in client.list_stacks():
-        if stack['Name'] == args.stack_name and stack.get('EndpointId') == endpoint_id:
-            existing_stack = stack
-            break
+    # Check if stack exists on each endpoint concurrently (shares the pooled session),
+    # warming the swarm ID cache at the same time in case a new stack is created.
+    # Prefetch errors are ignored here; deploy_stack fetches again and reports them.
+    existing_stacks: Dict[int, Optional[Dict]] = {}
+    with ThreadPoolExecutor(max_workers=min(8, 2 * len(endpoint_ids))) as executor:
+        for eid in endpoint_ids:
+            executor.submit(client.get_endpoint_swarm_id, eid)
+        futures = {
+            executor.submit(client.find_stack, args.stack_name, eid): eid
+            for eid in endpoint_ids
+        }
+        for future in as_completed(futures):
+            existing_stacks[futures[future]] = future.result()
     
     try:
-        if existing_stack:
-            print(f"📦 Updating existing stack '{args.stack_name}'...")
-            result = client.update_stack(
-                existing_stack['Id'],
-                compose_content,
-                endpoint_id,
-                env_vars
-            )
-            print(f"✓ Stack updated successfully!")
-        else:
-            print(f"📦 Deploying new stack '{args.stack_name}'...")
-            result = client.deploy_stack(
-                args.stack_name,
-                compose_content,
-                endpoint_id,
-                env_vars
-            )
-            print(f"✓ Stack deployed successfully!")
-        
-        # Validate deployment
-        if not args.no_validate:
-            if not client.validate_deployment(endpoint_id, args.stack_name):
-                return 1
+        for endpoint_id in endpoint_ids:
+            existing_stack = existing_stacks[endpoint_id]
+            
+            if existing_stack:
+                print(f"📦 Updating existing stack '{args.stack_name}' on endpoint {endpoint_id}...")
+                result = client.update_stack(
+                    existing_stack['Id'],
+                    compose_content,
+                    endpoint_id,
+                    env_vars
+                )
+                print(f"✓ Stack updated successfully!")
+            else:
+                print(f"📦 Deploying new stack '{args.stack_name}' on endpoint {endpoint_id}...")
+                result = client.deploy_stack(
+                    args.stack_name,
+                    compose_bytes,
+                    endpoint_id,
+                    env_vars
+                )
+                print(f"✓ Stack deployed successfully!")
+            
+            # Validate deployment
+            if not args.no_validate:
+                validate = client.watch_validation if args.watch else client.validate_deployment
+                if not validate(
+                    endpoint_id,
+                    args.stack_name,
+                    max_interval=args.poll_interval_max,
+                    verbose=args.verbose
+                ):
+                    return 1
         
         return 0
         
-    except requests.exceptions.HTTPError as e:
+    except requests.exceptions.RequestException as e:
         print(f"✗ Deployment failed: {e}")
         if e.response is not None:
             try:
@@ -417,18 +1171,17 @@ def cmd_delete(client: PortainerClient, args: argparse.Namespace) -> int:
     endpoint_id = client.get_endpoint_id(args.endpoint)
     
     # Find stack by name
-    for stack in client.list_stacks():
-        if stack['Name'] == args.stack_name:
-            if args.yes or input(f"Delete stack '{args.stack_name}'? [y/N]: ").lower() == 'y':
-                client.delete_stack(stack['Id'], endpoint_id)
-                print(f"✓ Stack '{args.stack_name}' deleted")
-                return 0
-            else:
-                print("Cancelled")
-                return 0
+    stack = client.find_stack(args.stack_name, endpoint_id)
+    if stack is None:
+        print(f"✗ Stack '{args.stack_name}' not found")
+        return 1
     
-    print(f"✗ Stack '{args.stack_name}' not found")
-    return 1
+    if args.yes or input(f"Delete stack '{args.stack_name}'? [y/N]: ").lower() == 'y':
+        client.delete_stack(stack['Id'], endpoint_id)
+        print(f"✓ Stack '{args.stack_name}' deleted")
+    else:
+        print("Cancelled")
+    return 0
 
 
 def main():
@@ -449,6 +1202,10 @@ Examples:
         --stack-name myapp --compose-file docker-compose.yml \\
         --env NODE_ENV=production --env DEBUG=false
 
+  Deploy stack to several endpoints:
+    %(prog)s --url https://portainer:9443 --user admin --password secret \\
+        --endpoint swarm-eu,swarm-us deploy --stack-name myapp --compose-file docker-compose.yml
+
   Delete stack:
     %(prog)s delete --url https://portainer:9443 --user admin --password secret \\
         --stack-name myapp --yes
@@ -460,22 +1217,47 @@ Examples:
     parser.add_argument('--user', '-u', required=True, help='Portainer username')
     parser.add_argument('--password', '-p', required=True, help='Portainer password')
     parser.add_argument('--verify-ssl', action='store_true', help='Verify SSL certificates')
-    parser.add_argument('--endpoint', help='Portainer endpoint name (default: first available)')
+    parser.add_argument('--timeout', type=float, default=30.0,
+                        help='Timeout in seconds for each Portainer API call (default: 30); '
+                             'stack create/update/delete only bound the connect')
+    parser.add_argument('--dns-ttl', type=float, default=30.0,
+                        help='Seconds before pooled connections are recycled to re-resolve the '
+                             'Portainer hostname (default: 30, 0 disables)')
+    parser.add_argument('--no-token-cache', action='store_true',
+                        help='Do not read or write the JWT cache in ~/.cache/portainer-automation')
+    parser.add_argument('--endpoint',
+                        help='Portainer endpoint name (default: first available); '
+                             'list and deploy accept a comma-separated list')
+    parser.add_argument('--endpoint-cache-ttl', type=float, default=60.0,
+                        help='Seconds to cache the endpoint list (default: 60, 0 disables)')
     
     subparsers = parser.add_subparsers(dest='command', help='Available commands')
     
     # List command
     list_parser = subparsers.add_parser('list', help='List all stacks')
+    list_parser.set_defaults(func=cmd_list)
     
     # Deploy command
     deploy_parser = subparsers.add_parser('deploy', help='Deploy or update a stack')
+    deploy_parser.set_defaults(func=cmd_deploy)
     deploy_parser.add_argument('--stack-name', '-n', required=True, help='Stack name')
     deploy_parser.add_argument('--compose-file', '-f', required=True, help='Path to docker-compose.yml')
     deploy_parser.add_argument('--env', '-e', action='append', help='Environment variable (KEY=VALUE)')
     deploy_parser.add_argument('--no-validate', action='store_true', help='Skip deployment validation')
+    deploy_parser.add_argument('--poll-interval-max', type=float, default=15.0,
+                               help='Maximum seconds between validation polls (default: 15)')
+    deploy_parser.add_argument('--watch', action='store_true',
+                               help='Validate by following Docker events instead of polling; container '
+                                    'events are node-local, so on multi-node swarms state is also '
+                                    're-checked every --poll-interval-max seconds')
+    deploy_parser.add_argument('--compress-uploads', action='store_true',
+                               help='Gzip compose uploads over 4 KiB (falls back to plain if rejected)')
+    deploy_parser.add_argument('--verbose', '-v', action='store_true',
+                               help='Show the per-service status table on every validation poll')
     
     # Delete command
     delete_parser = subparsers.add_parser('delete', help='Delete a stack')
+    delete_parser.set_defaults(func=cmd_delete)
     delete_parser.add_argument('--stack-name', '-n', required=True, help='Stack name to delete')
     delete_parser.add_argument('--yes', '-y', action='store_true', help='Skip confirmation')
     
@@ -486,21 +1268,22 @@ Examples:
         return 1
     
     # Initialize client
-    client = PortainerClient(args.url, verify_ssl=args.verify_ssl)
+    client = PortainerClient(
+        args.url,
+        verify_ssl=args.verify_ssl,
+        endpoint_cache_ttl=args.endpoint_cache_ttl,
+        token_cache=not args.no_token_cache,
+        timeout=args.timeout,
+        dns_ttl=args.dns_ttl,
+        compress_uploads=getattr(args, 'compress_uploads', False)
+    )
     
     # Authenticate
     if not client.authenticate(args.user, args.password):
         return 1
     
     # Execute command
-    if args.command == 'list':
-        return cmd_list(client, args)
-    elif args.command == 'deploy':
-        return cmd_deploy(client, args)
-    elif args.command == 'delete':
-        return cmd_delete(client, args)
-    
-    return 0
+    return args.func(client, args)
 
 
 if __name__ == '__main__':